@@ -6,8 +6,13 @@ Each joke has a setup, punchline, and laugh/groan counts.
 Users can add, list, search, view, and delete jokes via a simple CLI interface.
 """
 
-import json
-from textwrap import shorten
+import sys
+from itertools import islice
+
+from catalogue import empty_catalogue, fold_ratings_log, load_catalogue, save_data
+
+# Most search results shown at once, so a broad term doesn't flood the screen
+MAX_SEARCH_RESULTS = 50
 
 # -------------------------------------------------------
 # Helper Functions
@@ -29,6 +34,17 @@ def input_int(prompt):
             print("Invalid input. Please enter a whole number.")
 
 
+def parse_joke_id(arg, prompt):
+    """
+    Returns the joke number given with a combined command (e.g. "v 2") as a
+    joke id, or prompts for one if none or an invalid one was given.
+    """
+    try:
+        return str(int(arg))
+    except (TypeError, ValueError):
+        return str(input_int(prompt))
+
+
 def input_something(prompt):
     """
     Repeatedly prompts the user until they enter non-whitespace text.
@@ -41,181 +57,276 @@ def input_something(prompt):
         print("Input cannot be blank. Please try again.")
 
 
-def save_data(data_list):
+def describe_ratings(laughs, groans):
     """
-    Saves the provided data list to 'data.txt' in JSON format.
-    Overwrites the file each time it is called.
+    Returns the text shown under a joke when viewing it: the laugh/groan
+    counts with percentages, plus a comment for clearly rated jokes.
     """
-    with open("data.txt", "w") as file:
-        json.dump(data_list, file, indent=4)
+    if laughs == 0 and groans == 0:
+        return "This joke has not been rated."
 
+    total = laughs + groans
+    laugh_pct = (laughs / total) * 100
+    groan_pct = (groans / total) * 100
+    text = f"Laughs: {laughs} ({laugh_pct:.1f}%), Groans: {groans} ({groan_pct:.1f}%)"
 
-# -------------------------------------------------------
-# Program Initialization
-# -------------------------------------------------------
+    # --------------------------------------------------------------
+    # Addition and Enhancement 3: Extra commentary based on ratings
+    # --------------------------------------------------------------
+    if laughs >= 5 and groans == 0:
+        text += "\nThis joke is hilarious!"
+    elif groans >= 5 and laughs == 0:
+        text += "\nThis joke is groantastic!"
+    elif laughs >= 4 * groans and groans > 0:
+        text += "\nThis joke is hilarious!"
+    elif groans >= 4 * laughs and laughs > 0:
+        text += "\nThis joke is groantastic!"
+    return text
 
-# Load data from file, or initialize an empty list if file missing/corrupted.
-try:
-    with open("data.txt", "r") as file:
-        data = json.load(file)
-    if not isinstance(data, list):
-        raise ValueError
-except (FileNotFoundError, json.JSONDecodeError, ValueError):
-    data = []
 
-print("Welcome to the Joke Catalogue Admin Program.")
+def trim(text, width=50):
+    """
+    Returns the text cut down to at most `width` characters, ending in "..."
+    if anything was removed. Used to keep listed setups to one short line.
+    """
+    return text if len(text) <= width else text[:width - 3] + "..."
 
-# -------------------------------------------------------
-# Main Menu Loop
-# -------------------------------------------------------
-while True:
-    print("\nChoose [a]dd, [l]ist, [s]earch, [v]iew, [d]elete, [t]op or [q]uit.")
-    user_input = input("> ").strip()
-
-    # ----------------------------------------------------------------------------
-    # Addition and Enhancement 5: Split combined commands like "s hobbit" or "v 2"
-    # ----------------------------------------------------------------------------
-    parts = user_input.split(maxsplit=1)
-    choice = parts[0].lower()
-    arg = parts[1] if len(parts) > 1 else None
-
-    # ---------------------------------------------------
-    # Add a new joke
-    # ---------------------------------------------------
-    if choice == 'a':
-        setup = input_something("Enter setup of joke: ")
-        punchline = input_something("Enter punchline of joke: ")
-
-        joke = {
-            "setup": setup,
-            "punchline": punchline,
-            "laughs": 0,
-            "groans": 0
-        }
-
-        data.append(joke)
-        save_data(data)
-        print("Joke added.")
-
-    # ---------------------------------------------------
-    # List all jokes
-    # ---------------------------------------------------
-    elif choice == 'l':
-        if not data:
-            print("No jokes saved.")
-        else:
-            print("List of jokes:")
-            # ------------------------------------------------------------------
-            # Addition and Enhancement 2: Use shorten function to shorten setups
-            # ------------------------------------------------------------------
-            for i, joke in enumerate(data, start=1):
-                short_setup = shorten(joke["setup"], width=50, placeholder="...")
-                print(f"{i}) {short_setup}")
-
-    # ---------------------------------------------------
-    # Search jokes
-    # ---------------------------------------------------
-    elif choice == 's':
-        if not data:
-            print("No jokes saved.")
-        else:
-            term = arg.lower() if arg else input_something("Enter search term: ").lower()
-            results_found = False
-            print("Search results:")
-            # ------------------------------------------------------------------
-            # Addition and Enhancement 2: Use shorten function to shorten setups
-            # ------------------------------------------------------------------
-            for i, joke in enumerate(data, start=1):
-                if term in joke["setup"].lower() or term in joke["punchline"].lower():
-                    short_setup = shorten(joke["setup"], width=50, placeholder="...")
-                    print(f"{i}) {short_setup}")
-                    results_found = True
-            # --------------------------------------------------
-            # Addition and Enhancement 1: Show No results found
-            # ---------------------------------------------------
-            if not results_found:
-                print("No results found.")
-
-    # ---------------------------------------------------
-    # View a specific joke
-    # ---------------------------------------------------
-    elif choice == 'v':
-        if not data:
-            print("No jokes saved.")
-        else:
-            index = int(arg) - 1 if arg and arg.isdigit() else input_int("Joke number to view: ") - 1
-            if 0 <= index < len(data):
-                joke = data[index]
-                print(f"\n{joke['setup']}\n{joke['punchline']}")
-                laughs, groans = joke['laughs'], joke['groans']
-
-                if laughs == 0 and groans == 0:
-                    print("This joke has not been rated.")
+
+def trigrams(text):
+    """
+    Returns the set of all 3-character substrings of the given text.
+    Any string containing a search term of 3+ characters contains all of its trigrams.
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def add_to_index(index, joke_id, texts):
+    """Records the joke id under every trigram of the given (lowercased) texts."""
+    for gram in set().union(*map(trigrams, texts)):
+        index.setdefault(gram, set()).add(joke_id)
+
+
+def remove_from_index(index, joke_id, texts):
+    """Removes the joke id from every trigram of the given (lowercased) texts."""
+    for gram in set().union(*map(trigrams, texts)):
+        ids = index[gram]
+        ids.discard(joke_id)
+        if not ids:
+            del index[gram]
+
+
+def search_candidates(index, term):
+    """
+    Returns the ids of jokes that contain every trigram of the (lowercased) term,
+    which is a superset of the jokes containing the term itself.
+    Returns None if the term is too short to use the index.
+    """
+    if len(term) < 3:
+        return None
+    postings = [index.get(gram, set()) for gram in trigrams(term)]
+    return min(postings, key=len).intersection(*postings)
+
+
+def main():
+    """
+    Loads the joke catalogue and runs the main menu loop until the user quits.
+    All program state is kept in local variables, which are faster to look up
+    than module globals inside the loop.
+    """
+    # -------------------------------------------------------
+    # Program Initialization
+    # -------------------------------------------------------
+
+    # Load data from file, or start an empty catalogue if the file is missing.
+    # If the file exists but can't be read, nothing is saved over it this session.
+    # Jokes are kept in a dict keyed by id, so viewing and deleting don't need a scan.
+    can_save = True
+    try:
+        catalogue, dropped = load_catalogue()
+        if dropped:
+            print(f"Warning: {dropped} joke(s) in data.txt could not be read and were left out.")
+            print("The original file has been copied to data.txt.bak.")
+    except FileNotFoundError:
+        catalogue = empty_catalogue()
+    except (OSError, ValueError):
+        catalogue = empty_catalogue()
+        can_save = False
+        print("Warning: data.txt could not be read, so jokes can't be added or deleted until it is fixed.")
+    data = catalogue["jokes"]
+
+    # Fold in any ratings journaled by jokes.py so they aren't lost when this
+    # program next saves the file. If that save fails the journal is kept as is.
+    if can_save:
+        try:
+            fold_ratings_log(catalogue)
+        except OSError:
+            can_save = False
+            print("Warning: data.txt could not be saved, so jokes can't be added or deleted this session.")
+
+    # Lowercased (setup, punchline) for each joke id, worked out once here rather
+    # than on every search. Kept apart from the jokes so it is never saved.
+    lowered = {joke_id: (joke["setup"].lower(), joke["punchline"].lower()) for joke_id, joke in data.items()}
+
+    # Trigram -> set of joke ids, so searches only check jokes that could match.
+    search_index = {}
+    for joke_id, texts in lowered.items():
+        add_to_index(search_index, joke_id, texts)
+
+    print("Welcome to the Joke Catalogue Admin Program.")
+
+    # -------------------------------------------------------
+    # Main Menu Loop
+    # -------------------------------------------------------
+    while True:
+        print("\nChoose [a]dd, [l]ist, [s]earch, [v]iew, [d]elete, [t]op or [q]uit.")
+        user_input = input("> ").strip()
+
+        # ----------------------------------------------------------------------------
+        # Addition and Enhancement 5: Split combined commands like "s hobbit" or "v 2"
+        # ----------------------------------------------------------------------------
+        parts = user_input.split(maxsplit=1)
+        choice = parts[0].lower()
+        arg = parts[1] if len(parts) > 1 else None
+
+        # Never overwrite a data file that couldn't be read or saved
+        if choice in ('a', 'd') and not can_save:
+            print("data.txt could not be read or saved, so jokes can't be added or deleted.")
+            continue
+
+        # ---------------------------------------------------
+        # Add a new joke
+        # ---------------------------------------------------
+        if choice == 'a':
+            setup = input_something("Enter setup of joke: ")
+            punchline = input_something("Enter punchline of joke: ")
+
+            joke = {
+                "setup": setup,
+                "punchline": punchline,
+                "laughs": 0,
+                "groans": 0
+            }
+
+            joke_id = str(catalogue["next_id"])
+            catalogue["next_id"] += 1
+            data[joke_id] = joke
+            lowered[joke_id] = (setup.lower(), punchline.lower())
+            add_to_index(search_index, joke_id, lowered[joke_id])
+            save_data(catalogue)
+            print("Joke added.")
+
+        # ---------------------------------------------------
+        # List all jokes
+        # ---------------------------------------------------
+        elif choice == 'l':
+            if not data:
+                print("No jokes saved.")
+            else:
+                print("List of jokes:")
+                # ------------------------------------------------------------------
+                # Addition and Enhancement 2: Use trim function to shorten setups
+                # ------------------------------------------------------------------
+                # The whole listing is built first and written out in one call
+                sys.stdout.write("".join(f"{joke_id}) {trim(joke['setup'])}\n" for joke_id, joke in data.items()))
+
+        # ---------------------------------------------------
+        # Search jokes
+        # ---------------------------------------------------
+        elif choice == 's':
+            if not data:
+                print("No jokes saved.")
+            else:
+                term = arg.lower() if arg else input_something("Enter search term: ").lower()
+                print("Search results:")
+                # ------------------------------------------------------------------
+                # Addition and Enhancement 2: Use trim function to shorten setups
+                # ------------------------------------------------------------------
+                # Narrow the search down with the trigram index where possible,
+                # then confirm each candidate actually contains the term
+                candidates = search_candidates(search_index, term)
+                joke_ids = data if candidates is None else sorted(candidates, key=int)
+                hits = (joke_id for joke_id in joke_ids
+                        if term in lowered[joke_id][0] or term in lowered[joke_id][1])
+                results = "".join(f"{joke_id}) {trim(data[joke_id]['setup'])}\n"
+                                  for joke_id in islice(hits, MAX_SEARCH_RESULTS))
+                sys.stdout.write(results)
+                if next(hits, None) is not None:
+                    print(f"(Only the first {MAX_SEARCH_RESULTS} results are shown.)")
+                # --------------------------------------------------
+                # Addition and Enhancement 1: Show No results found
+                # ---------------------------------------------------
+                if not results:
+                    print("No results found.")
+
+        # ---------------------------------------------------
+        # View a specific joke
+        # ---------------------------------------------------
+        elif choice == 'v':
+            if not data:
+                print("No jokes saved.")
+            else:
+                joke_id = parse_joke_id(arg, "Joke number to view: ")
+                joke = data.get(joke_id)
+                if joke is not None:
+                    print(f"\n{joke['setup']}\n{joke['punchline']}")
+                    print(describe_ratings(joke['laughs'], joke['groans']))
                 else:
-                    total = laughs + groans
-                    laugh_pct = (laughs / total) * 100 if total else 0
-                    groan_pct = (groans / total) * 100 if total else 0
-                    print(f"Laughs: {laughs} ({laugh_pct:.1f}%), Groans: {groans} ({groan_pct:.1f}%)")
-
-                    # --------------------------------------------------------------
-                    # Addition and Enhancement 3: Extra commentary based on ratings
-                    # --------------------------------------------------------------
-                    if laughs >= 5 and groans == 0:
-                        print("This joke is hilarious!")
-                    elif groans >= 5 and laughs == 0:
-                        print("This joke is groantastic!")
-                    elif laughs >= 4 * groans and groans > 0:
-                        print("This joke is hilarious!")
-                    elif groans >= 4 * laughs and laughs > 0:
-                        print("This joke is groantastic!")
+                    print("Invalid joke number.")
+
+        # ---------------------------------------------------
+        # Delete a joke
+        # ---------------------------------------------------
+        elif choice == 'd':
+            if not data:
+                print("No jokes saved.")
             else:
-                print("Invalid index number.")
-
-    # ---------------------------------------------------
-    # Delete a joke
-    # ---------------------------------------------------
-    elif choice == 'd':
-        if not data:
-            print("No jokes saved.")
-        else:
-            index = int(arg) - 1 if arg and arg.isdigit() else input_int("Joke number to delete: ") - 1
-            if 0 <= index < len(data):
-                del data[index]
-                save_data(data)
-                print("Joke deleted.")
+                joke_id = parse_joke_id(arg, "Joke number to delete: ")
+                if data.pop(joke_id, None) is not None:
+                    remove_from_index(search_index, joke_id, lowered.pop(joke_id))
+                    save_data(catalogue)
+                    print("Joke deleted.")
+                else:
+                    print("Invalid joke number.")
+
+        # ---------------------------------------------------
+        # Addition and Enhancement 4: Display top-rated jokes
+        # ---------------------------------------------------
+        elif choice == 't':
+            if not data:
+                print("No jokes saved.")
             else:
-                print("Invalid index number.")
-
-    # ---------------------------------------------------
-    # Addition and Enhancement 4: Display top-rated jokes
-    # ---------------------------------------------------
-    elif choice == 't':
-        if not data:
-            print("No jokes saved.")
+                # Find jokes with max laughs and max groans in a single pass
+                jokes = iter(data.values())
+                top_laughs = top_groans = next(jokes)
+                for joke in jokes:
+                    if joke["laughs"] > top_laughs["laughs"]:
+                        top_laughs = joke
+                    if joke["groans"] > top_groans["groans"]:
+                        top_groans = joke
+
+                print("\nTop Laughs Joke:")
+                print(f"{top_laughs['setup']}")
+                print(f"Punchline: {top_laughs['punchline']}")
+                print(f"Laughs: {top_laughs['laughs']}, Groans: {top_laughs['groans']}")
+
+                print("\nTop Groans Joke:")
+                print(f"{top_groans['setup']}")
+                print(f"Punchline: {top_groans['punchline']}")
+                print(f"Laughs: {top_groans['laughs']}, Groans: {top_groans['groans']}")
+
+        # ---------------------------------------------------
+        # Quit program
+        # ---------------------------------------------------
+        elif choice == 'q':
+            print("Goodbye!")
+            break
+
+        # ---------------------------------------------------
+        # Invalid option
+        # ---------------------------------------------------
         else:
-            # Find jokes with max laughs and max groans
-            top_laughs = max(data, key=lambda j: j["laughs"])
-            top_groans = max(data, key=lambda j: j["groans"])
-
-            print("\nTop Laughs Joke:")
-            print(f"{top_laughs['setup']}")
-            print(f"Punchline: {top_laughs['punchline']}")
-            print(f"Laughs: {top_laughs['laughs']}, Groans: {top_laughs['groans']}")
-
-            print("\nTop Groans Joke:")
-            print(f"{top_groans['setup']}")
-            print(f"Punchline: {top_groans['punchline']}")
-            print(f"Laughs: {top_groans['laughs']}, Groans: {top_groans['groans']}")
-
-    # ---------------------------------------------------
-    # Quit program
-    # ---------------------------------------------------
-    elif choice == 'q':
-        print("Goodbye!")
-        break
-
-    # ---------------------------------------------------
-    # Invalid option
-    # ---------------------------------------------------
-    else:
-        print("Invalid choice. Please try again.")
+            print("Invalid choice. Please try again.")
+
+
+if __name__ == "__main__":
+    main()
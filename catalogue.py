@@ -0,0 +1,257 @@
+"""
+catalogue.py
+------------------------------------------------
+Shared code for reading and writing the joke catalogue, used by both
+admin.py and jokes.py so the two programs always agree on the file formats:
+- 'data.txt'        the catalogue itself, as JSON
+                    {"next_id": N, "last_rating": S, "jokes": {id: joke}}
+- 'data.cache.pkl'  a pickled copy of the catalogue for faster startup, tagged
+                    with the size and mtime of the 'data.txt' it was made from
+- 'ratings.log'     ratings journaled by jokes.py, one "seq,id,rating" per line
+The catalogue's "last_rating" is the sequence number of the last journaled
+rating already counted in 'data.txt', so replaying the journal never counts
+a rating twice.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+
+# orjson is an optional, faster drop-in for the standard json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Largest laugh/groan count accepted, so every count fits a 64-bit integer
+# (jokes.py keeps them in array('q') and orjson can't write anything wider)
+MAX_COUNT = 2**63 - 1
+
+
+def encode_json(obj):
+    """Returns the object as compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def decode_json(raw):
+    """Parses JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def replace_file(path, payload):
+    """
+    Writes the bytes to a temporary file beside `path`, flushes them to disk,
+    then swaps it into place, so a crash or power loss part-way through never
+    leaves a half-written file behind. Each call gets its own temporary file,
+    so admin.py and jokes.py saving at once can't clobber each other's.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                     prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            # mkstemp makes the file private; keep the permissions a plain open() would give
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(temp_path, mode)
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def to_count(value):
+    """
+    Returns a loaded laugh/groan count as a non-negative int. Whole-number
+    floats (e.g. 1.0) and digit strings are converted and negative counts
+    become 0. Raises ValueError if the value is not a whole number or is
+    larger than MAX_COUNT.
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str) and value.strip().isdecimal():
+        value = int(value)
+    if not isinstance(value, int):
+        raise ValueError
+    if value > MAX_COUNT:
+        raise ValueError
+    return max(int(value), 0)
+
+
+def to_joke(item):
+    """
+    Returns the loaded joke as a dict with exactly the setup, punchline,
+    laughs and groans keys, with missing counts set to 0 and other counts
+    fixed up by to_count. Raises ValueError if the joke can't be used.
+    """
+    if not isinstance(item, dict):
+        raise ValueError
+    setup, punchline = item.get("setup"), item.get("punchline")
+    if not isinstance(setup, str) or not isinstance(punchline, str):
+        raise ValueError
+    laughs, groans = to_count(item.get("laughs", 0)), to_count(item.get("groans", 0))
+    return {"setup": setup, "punchline": punchline, "laughs": laughs, "groans": groans}
+
+
+def empty_catalogue():
+    """Returns a new catalogue with no jokes."""
+    return {"next_id": 1, "last_rating": 0, "jokes": {}}
+
+
+def to_catalogue(loaded):
+    """
+    Validates data loaded from 'data.txt' and returns (catalogue, dropped),
+    where the catalogue dict has next_id, last_rating and jokes (keyed by
+    joke id). Every joke is checked once here, so the rest of the program
+    can rely on its keys and types. Jokes without a usable id are given a
+    new one; jokes that can't be used at all are left out and counted in
+    `dropped`. The older plain list format is upgraded by numbering its
+    jokes from 1. Raises ValueError if the file as a whole is invalid.
+    """
+    if isinstance(loaded, list):
+        loaded = {"jokes": {str(i): joke for i, joke in enumerate(loaded, start=1)}}
+    if not isinstance(loaded, dict) or not isinstance(loaded.get("jokes"), dict):
+        raise ValueError
+
+    jokes, unnumbered, dropped = {}, [], 0
+    for joke_id, item in loaded["jokes"].items():
+        try:
+            joke = to_joke(item)
+        except ValueError:
+            dropped += 1
+            continue
+        if joke_id.isdecimal() and str(int(joke_id)) not in jokes:
+            jokes[str(int(joke_id))] = joke
+        else:
+            unnumbered.append(joke)
+
+    # The next id must never reuse one already in the file
+    next_id = loaded.get("next_id")
+    lowest_free = max(map(int, jokes), default=0) + 1
+    if not isinstance(next_id, int) or next_id < lowest_free:
+        next_id = lowest_free
+    for joke in unnumbered:
+        jokes[str(next_id)] = joke
+        next_id += 1
+    last_rating = loaded.get("last_rating")
+    if not isinstance(last_rating, int) or last_rating < 0:
+        last_rating = 0
+    return {"next_id": next_id, "last_rating": last_rating, "jokes": jokes}, dropped
+
+
+def data_fingerprint():
+    """Returns the (size, mtime in ns) of 'data.txt', used to tell if the cache matches it."""
+    stat = os.stat("data.txt")
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_cache(catalogue):
+    """
+    Writes the catalogue to 'data.cache.pkl', tagged with the fingerprint of
+    the current 'data.txt'. The cache is only a speed-up, so failing to
+    write it (e.g. in a read-only folder) is ignored.
+    """
+    try:
+        cache = {"source": data_fingerprint(), "catalogue": catalogue}
+        replace_file("data.cache.pkl", pickle.dumps(cache, protocol=5))
+    except OSError:
+        pass
+
+
+def load_catalogue():
+    """
+    Loads the catalogue from 'data.cache.pkl' if it was made from the current
+    'data.txt' (same size and mtime), otherwise parses 'data.txt' and refreshes
+    the cache. An empty 'data.txt' gives an empty catalogue.
+    Returns (catalogue, dropped) as to_catalogue does. If any jokes were
+    dropped, the original file is first copied to 'data.txt.bak' so a later
+    save can't lose them for good.
+    Raises the usual file/JSON errors (OSError, ValueError).
+    """
+    source = data_fingerprint()
+    try:
+        with open("data.cache.pkl", "rb") as file:
+            cache = pickle.load(file)
+        if isinstance(cache, dict) and cache.get("source") == source:
+            return to_catalogue(cache["catalogue"])
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass  # Missing or unreadable cache - fall back to the JSON file
+
+    # The file is read in one go and parsed from that buffer
+    with open("data.txt", "rb") as file:
+        raw = file.read()
+    if not raw:
+        return empty_catalogue(), 0
+    catalogue, dropped = to_catalogue(decode_json(raw))
+    if dropped:
+        replace_file("data.txt.bak", raw)
+    write_cache(catalogue)
+    return catalogue, dropped
+
+
+def save_data(catalogue):
+    """
+    Saves the catalogue to 'data.txt' in JSON format, along with the pickled
+    copy in 'data.cache.pkl'. The data is serialized in memory first
+    (in compact form) and each file is swapped in atomically.
+    """
+    replace_file("data.txt", encode_json(catalogue))
+    write_cache(catalogue)
+
+
+def apply_ratings_log(catalogue):
+    """
+    Replays the ratings recorded in 'ratings.log' onto the catalogue's jokes.
+    Each line holds a sequence number, the joke's id and the rating given;
+    entries numbered at or below the catalogue's last_rating were already
+    counted and are skipped. Returns the number of ratings applied.
+    """
+    try:
+        with open("ratings.log", "r") as log:
+            lines = log.readlines()
+    except FileNotFoundError:
+        return 0
+
+    jokes = catalogue["jokes"]
+    applied = 0
+    for line in lines:
+        try:
+            seq, joke_id, rating = line.strip().split(",")
+            seq = int(seq)
+            if rating not in ("laughs", "groans"):
+                raise ValueError
+        except ValueError:
+            continue  # Skip partially written entries
+        if seq <= catalogue["last_rating"]:
+            continue  # Already folded into 'data.txt'
+        catalogue["last_rating"] = seq
+        if joke_id in jokes:  # The joke may have been deleted since
+            jokes[joke_id][rating] += 1
+            applied += 1
+    return applied
+
+
+def fold_ratings_log(catalogue):
+    """
+    Applies any ratings left in 'ratings.log' (e.g. by a session that ended
+    early) to the catalogue, saves it and empties the journal. Safe to repeat
+    if interrupted, since already counted entries are skipped on replay.
+    """
+    if apply_ratings_log(catalogue):
+        save_data(catalogue)
+    if os.path.exists("ratings.log"):
+        open("ratings.log", "w").close()
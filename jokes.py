@@ -8,8 +8,12 @@ and the next joke is displayed until all jokes have been rated.
 
 import tkinter
 from tkinter import messagebox
-import json
-import random
+from array import array
+
+from catalogue import fold_ratings_log, load_catalogue, save_data
+
+# Number of journaled ratings after which they are folded back into 'data.txt'
+LOG_FOLD_THRESHOLD = 50
 
 
 class ProgramGUI:
@@ -24,25 +28,59 @@ class ProgramGUI:
         # Attempt to load data from JSON file
         # Addition and Enhancement 5: for random order
         try:
-            with open("data.txt", "r") as file:
-                self.data = json.load(file)
-            if not isinstance(self.data, list) or not self.data:
+            self.catalogue, dropped = load_catalogue()
+            if dropped:
+                messagebox.showwarning(
+                    "Warning",
+                    f"{dropped} joke(s) in data.txt could not be read and were left out.\n"
+                    "The original file has been copied to data.txt.bak."
+                )
+            self.jokes = self.catalogue["jokes"]  # Keyed by joke id
+            if not self.jokes:
                 raise ValueError
-            random.shuffle(self.data)  # Shuffle jokes once at start
-        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            # Fold in any ratings left over from a previous session
+            fold_ratings_log(self.catalogue)
+            # Jokes stay in file order; only a list of their indexes is shuffled,
+            # once at start, to decide the order in which they are shown
+            self.ids = list(self.jokes)
+            self.data = [self.jokes[joke_id] for joke_id in self.ids]
+            import random  # Only needed here, so it isn't loaded when the file is invalid
+            self.order = list(range(len(self.data)))
+            random.shuffle(self.order)
+            # Rating counters live in flat integer arrays (same order as self.data)
+            # while the program runs, and are copied back into the jokes on save
+            self.laughs = array('q', (joke["laughs"] for joke in self.data))
+            self.groans = array('q', (joke["groans"] for joke in self.data))
+            self.counters = {'laughs': self.laughs, 'groans': self.groans}
+        except (OSError, ValueError):
             messagebox.showerror("Error", "Missing/Invalid file.")
             self.window.destroy()
             return
 
+        # Ratings are appended to a journal and only folded into 'data.txt' periodically
+        try:
+            self.log = open("ratings.log", "a")
+        except OSError:
+            messagebox.showerror("Error", "Could not open ratings.log, so ratings can't be recorded.")
+            self.window.destroy()
+            return
+
         # Track current joke index
         self.current_joke = 0
 
+        # Each journaled rating gets the next sequence number after the last one folded
+        self.rating_seq = self.catalogue["last_rating"]
+        self.pending_ratings = 0
+        self.window.protocol("WM_DELETE_WINDOW", self.close_program)
+
         # Create GUI layout
         self.setup_label = tkinter.Label(self.window, text="", font=("Arial", 14, "bold"), wraplength=400, justify="center")
         self.setup_label.pack(pady=(20, 10))
 
         self.punchline_label = tkinter.Label(self.window, text="", font=("Arial", 12, "italic"), wraplength=400, justify="center")
         self.punchline_label.pack(pady=(0, 20))
+        # Addition and Enhancement 4: Reveal punchline on click (bound once, reads the current joke)
+        self.punchline_label.bind("<Button-1>", self.reveal_punchline)
 
         # Buttons frame
         button_frame = tkinter.Frame(self.window)
@@ -68,7 +106,8 @@ class ProgramGUI:
     # ----------------------------------------------------------------
     def show_joke(self):
         """Displays the current joke (setup and punchline) in the GUI."""
-        joke = self.data[self.current_joke]
+        index = self.order[self.current_joke]
+        joke = self.data[index]
 
         # Update setup
         self.setup_label.configure(text=joke["setup"])
@@ -76,7 +115,7 @@ class ProgramGUI:
         self.punchline_label.configure(text="(Click to reveal punchline)")
 
         # Addition and Enhancement 2: Show rating info
-        laughs, groans = joke["laughs"], joke["groans"]
+        laughs, groans = self.laughs[index], self.groans[index]
         if laughs == 0 and groans == 0:
             info_text = "New joke — no ratings yet."
         else:
@@ -87,15 +126,13 @@ class ProgramGUI:
             text=f"Joke {self.current_joke + 1}/{len(self.data)}   |   {info_text}"
         )
 
-        # Addition and Enhancement 4: Reveal punchline on click
-        self.punchline_label.bind("<Button-1>", lambda e: self.reveal_punchline(joke["punchline"]))
-
     # ----------------------------------------------------------------
     # Addition and Enhancement 4: Reveal punchline on click
     # ----------------------------------------------------------------
-    def reveal_punchline(self, text):
-        """Displays the punchline when the user clicks on the placeholder."""
-        self.punchline_label.configure(text=text)
+    def reveal_punchline(self, event):
+        """Displays the current joke's punchline when the user clicks on the placeholder."""
+        joke = self.data[self.order[self.current_joke]]
+        self.punchline_label.configure(text=joke["punchline"])
 
     # ----------------------------------------------------------------
     # Method 2: rate_joke()
@@ -103,19 +140,24 @@ class ProgramGUI:
     def rate_joke(self, rating):
         """
         Records the user's rating ('laughs' or 'groans') for the current joke.
-        Updates the data file, then moves to the next joke or ends the program.
+        Appends it to the ratings journal, then moves to the next joke or ends the program.
         """
-        # Increment rating counter in the joke dictionary
-        self.data[self.current_joke][rating] += 1
-
-        # Save updated data back to file
-        with open("data.txt", "w") as file:
-            json.dump(self.data, file, indent=4)
+        # Increment the rating counter for the current joke
+        index = self.order[self.current_joke]
+        self.counters[rating][index] += 1
+
+        # Journal the rating; the full file is only rewritten once enough have built up
+        self.rating_seq += 1
+        self.log.write(f"{self.rating_seq},{self.ids[index]},{rating}\n")
+        self.log.flush()
+        self.pending_ratings += 1
+        if self.pending_ratings >= LOG_FOLD_THRESHOLD:
+            self.fold_ratings_log()
 
         # Check if this was the last joke
         if self.current_joke == len(self.data) - 1:
             messagebox.showinfo("Rating Recorded", "That was the last joke. Thanks for rating!")
-            self.window.destroy()
+            self.close_program()
         else:
             # Addition and Enhancement: thank the user after each joke
             messagebox.showinfo(
@@ -134,12 +176,43 @@ class ProgramGUI:
         """Skips to the next joke without rating."""
         if self.current_joke == len(self.data) - 1:
             messagebox.showinfo("End", "That was the last joke. No rating recorded.")
-            self.window.destroy()
+            self.close_program()
         else:
             messagebox.showinfo("Skipped", "You abstained from rating.\nThe next joke will now appear.")
             self.current_joke += 1
             self.show_joke()
 
+    # ----------------------------------------------------------------
+    # Saving and journal handling
+    # ----------------------------------------------------------------
+    def fold_ratings_log(self):
+        """
+        Writes all journaled ratings into 'data.txt' and empties the journal.
+        The saved last_rating marks them as counted, so if the program stops
+        before the journal is emptied they are not counted again on replay.
+        """
+        for joke, laughs, groans in zip(self.data, self.laughs, self.groans):
+            joke["laughs"], joke["groans"] = laughs, groans
+        self.catalogue["last_rating"] = self.rating_seq
+        save_data(self.catalogue)
+        self.log.seek(0)
+        self.log.truncate()
+        self.pending_ratings = 0
+
+    def close_program(self):
+        """
+        Folds any outstanding ratings into 'data.txt' and closes the window.
+        If 'data.txt' can't be saved the ratings stay in the journal and are
+        folded in on the next start.
+        """
+        try:
+            if self.pending_ratings:
+                self.fold_ratings_log()
+        except OSError:
+            messagebox.showerror("Error", "Could not save data.txt. Your ratings will be added next time.")
+        self.log.close()
+        self.window.destroy()
+
 
 # Create an object of the ProgramGUI class to begin the program.
 if __name__ == "__main__":